@@ -20,83 +20,245 @@
     python chat_stats.py /path/to/kernelcat/sessions --cli-name kcat
 """
 
+import os
+import sys
 import json
+import mmap
 import argparse
+import operator
+import functools
 from pathlib import Path
-from datetime import datetime, timedelta
-from collections import defaultdict
-from typing import List, Dict, Any, Tuple
+from datetime import date, datetime, timedelta
+from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, NamedTuple
+
+# 优先使用更快的 JSON 解析库（orjson > ujson > 标准库 json）
+try:
+    import orjson as _json
+except ImportError:
+    try:
+        import ujson as _json
+    except ImportError:
+        _json = json
+
+
+class Message(NamedTuple):
+    """统计用的消息记录
+
+    以元组存储，每个字段只占一个指针，比同样字段的字典节省大量内存，字段访问也更快。
+    """
+    type: str
+    timestamp: str
+    uuid: str
+    session_id: str
+    has_tool_use: bool
+    has_tool_result: bool
+    is_real_user: bool  # 真实用户消息（非tool_result），一次响应的边界
+    has_text: bool  # 是否包含非空文本（空消息不算真实用户提问；只对真实用户消息计算）
+    ts_dt: datetime  # 解析后的时间戳，无法解析时为 None
+    dedup_key: Any  # 去重标识：有 uuid 时为 uuid，否则为 _fallback_dedup_key 生成的元组
+    first_text: str  # 首个文本块的前100个字符（仅真实用户消息，用作长响应的问题摘要）
+
+
+class IdlePeriod(NamedTuple):
+    """一次响应中的中断时段"""
+    start: datetime
+    end: datetime
+    duration: timedelta
+
+
+class LongResponse(NamedTuple):
+    """超过1小时的响应"""
+    user_question: str  # 用户问题的简短摘要
+    start_time: datetime
+    end_time: datetime
+    total_duration: timedelta  # 总时长（包含中断）
+    active_duration: timedelta  # 实际工作时间（不含中断）
+    idle_periods: List[IdlePeriod]
+    assistant_messages: int
+    tool_uses: int
+
+
+# 耗时统计阈值（模块级常量，避免在循环中反复构造 timedelta）
+IDLE_THRESHOLD = timedelta(minutes=30)  # 超过30分钟视为中断
+LONG_RESPONSE_THRESHOLD = timedelta(hours=1)  # 超过1小时视为长响应
+_ZERO = timedelta()
+
+# 排序/计数键：C 实现的取属性函数，避免每次调用 Python lambda
+_BY_TIMESTAMP = operator.attrgetter('timestamp')
+_BY_TYPE = operator.attrgetter('type')
+_BY_EVENT_TIME = operator.itemgetter(0)
+
+
+# Python 3.11+ 的 datetime.fromisoformat 可直接解析以 'Z' 结尾的时间戳
+_PY311 = sys.version_info >= (3, 11)
+
+
+def _parse_ts(timestamp_str: str) -> datetime:
+    """解析 ISO 格式时间戳，无法解析时返回 None
+
+    不做缓存：每个文件在各自的子进程中解析，同一文件内时间戳几乎不重复，缓存几乎不命中，
+    维护缓存的开销反而比 fromisoformat 本身更大。
+    """
+    if not timestamp_str:
+        return None
+    try:
+        if _PY311:
+            return datetime.fromisoformat(timestamp_str)
+        if timestamp_str.endswith('Z'):
+            return datetime.fromisoformat(timestamp_str[:-1] + '+00:00')
+        return datetime.fromisoformat(timestamp_str)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def _fallback_dedup_key(timestamp: str, msg_type: str, session_id: str, content: Any) -> tuple:
+    """为没有 uuid 的消息生成去重标识
+
+    以时间戳、类型、会话和首段文本的前40个字符组成元组，不对整个消息字典做 str()
+    （开销与内容大小成正比，且结果依赖字典的 repr）。
+    """
+    if isinstance(content, str):
+        text = content
+    elif content and isinstance(content[0], dict):
+        text = content[0].get('text') or ''
+    else:
+        text = ''
+    return (timestamp, msg_type, session_id, text[:40])
+
+
+def _first_text(content: Any) -> str:
+    """取首个文本块的前100个字符（content 为字符串时即其本身）"""
+    if isinstance(content, str):
+        return content[:100]
+    for c in content:
+        if isinstance(c, dict) and c.get('type') == 'text':
+            text = c.get('text', '')
+            return text[:100] if isinstance(text, str) else ''
+    return ''
 
 
-def parse_claude_code_line(data: Dict, file_path: Path) -> Tuple[Dict[str, Any], str]:
+def parse_claude_code_line(data: Dict, file_path: Path) -> Tuple[Message, str]:
     """解析 Claude Code 格式的一行
 
     Returns:
-        (message_dict, session_id)
+        (message, session_id)
     """
     msg_type = data.get('type')
     if msg_type not in ['user', 'assistant']:
         return None, ''
 
-    # 检查是否有tool相关内容
-    has_tool_use = any(
-        c.get('type') == 'tool_use'
-        for c in data.get('message', {}).get('content', [])
+    # 类型和会话ID大量重复，intern 后共享同一个字符串
+    msg_type = sys.intern(msg_type)
+    session_id = sys.intern(data.get('sessionId') or '')
+
+    # 按消息类型只做需要的检查
+    message_data = data.get('message') or {}
+    content = message_data.get('content') or ()
+    has_tool_use = False
+    has_text = False
+    if msg_type == 'assistant':
+        has_tool_result = False
+        # tool_use 通常是最后一个内容块，从后往前找到即停
+        for c in reversed(content):
+            if isinstance(c, dict) and c.get('type') == 'tool_use':
+                has_tool_use = True
+                break
+    else:
+        has_tool_result = 'toolUseResult' in data
+        if has_tool_result:
+            pass
+        elif isinstance(content, str):
+            # 直接输入的提示词 content 为纯字符串
+            has_text = bool(content.strip())
+        else:
+            for c in content:
+                if isinstance(c, dict) and c.get('type') == 'text':
+                    text = c.get('text', '')
+                    if isinstance(text, str) and text.strip():
+                        has_text = True
+                        break
+
+    timestamp = data.get('timestamp', '')
+    uuid = data.get('uuid', '')
+    is_real_user = msg_type == 'user' and not has_tool_result
+    message = Message(
+        type=msg_type,
+        timestamp=timestamp,
+        uuid=uuid,
+        session_id=session_id,
+        has_tool_use=has_tool_use,
+        has_tool_result=has_tool_result,
+        is_real_user=is_real_user,
+        has_text=has_text,
+        ts_dt=_parse_ts(timestamp),
+        dedup_key=uuid or _fallback_dedup_key(timestamp, msg_type, session_id, content),
+        first_text=_first_text(content) if is_real_user else ''
     )
-    has_tool_result = 'toolUseResult' in data
 
-    message = {
-        'type': msg_type,
-        'timestamp': data.get('timestamp', ''),
-        'uuid': data.get('uuid', ''),
-        'message': data.get('message', {}),
-        'session_id': data.get('sessionId', ''),
-        'has_tool_use': has_tool_use,
-        'has_tool_result': has_tool_result
-    }
+    return message, session_id
+
 
-    return message, data.get('sessionId', '')
+def _kernelcat_session_id(file_path: Path) -> str:
+    """从 kernelcat session 文件名中提取 session_id（同一文件的消息共享同一个 intern 后的字符串）"""
+    return sys.intern(Path(file_path).stem.split('-')[-1])
 
 
-def parse_kernelcat_line(data: Dict, file_path: Path) -> Tuple[Dict[str, Any], str]:
+def parse_kernelcat_line(data: Dict, file_path: Path, session_id: str = None) -> Tuple[Message, str]:
     """解析 kernelcat 格式的一行
 
+    Args:
+        session_id: 文件对应的 session_id，批量解析同一文件时预先算好传入，省去逐行从文件名提取
+
     Returns:
-        (message_dict, session_id)
+        (message, session_id)
     """
     if data.get('type') != 'response_item':
         return None, ''
 
-    payload = data.get('payload', {})
+    payload = data.get('payload')
+    if not payload:
+        return None, ''
     role = payload.get('role', '')
     if role not in ['user', 'assistant']:
         return None, ''
 
     # kernelcat 没有 tool_use/tool_result 概念，默认设为 False
-    # 从文件名提取 session_id
-    session_id = file_path.stem.split('-')[-1]
+    role = sys.intern(role)
+    if session_id is None:
+        session_id = _kernelcat_session_id(file_path)
 
     # 转换为统一格式
     message_content = []
-    for item in payload.get('content', []):
+    has_text = False
+    for item in payload.get('content') or ():
         item_type = item.get('type', '')
         if item_type in ['input_text', 'output_text']:
+            text = item.get('text', '')
             message_content.append({
                 'type': 'text',
-                'text': item.get('text', '')
+                'text': text
             })
+            if not has_text:
+                has_text = isinstance(text, str) and bool(text.strip())
         else:
             message_content.append(item)
 
-    message = {
-        'type': role,
-        'timestamp': data.get('timestamp', ''),
-        'uuid': '',  # kernelcat 没有 uuid
-        'message': {'content': message_content},
-        'session_id': session_id,
-        'has_tool_use': False,
-        'has_tool_result': False
-    }
+    timestamp = data.get('timestamp', '')
+    message = Message(
+        type=role,
+        timestamp=timestamp,
+        uuid='',  # kernelcat 没有 uuid
+        session_id=session_id,
+        has_tool_use=False,
+        has_tool_result=False,
+        is_real_user=role == 'user',
+        has_text=has_text,
+        ts_dt=_parse_ts(timestamp),
+        dedup_key=_fallback_dedup_key(timestamp, role, session_id, message_content),
+        first_text=_first_text(message_content) if role == 'user' else ''
+    )
 
     return message, session_id
 
@@ -111,13 +273,21 @@ def get_session_project(file_path: Path) -> str:
         项目路径，如果无法获取则返回空字符串
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            first_line = f.readline()
-            if first_line.strip():
-                data = json.loads(first_line)
-                if data.get('type') == 'session_meta':
-                    payload = data.get('payload', {})
-                    return payload.get('cwd', '')
+        with open(file_path, 'rb') as f:
+            return _project_from_first_line(f.readline())
+    except:
+        pass
+    return ''
+
+
+def _project_from_first_line(first_line: bytes) -> str:
+    """从 session 文件的首行（session_meta）中提取项目路径，无法获取时返回空字符串"""
+    try:
+        if first_line.strip():
+            data = _json.loads(first_line)
+            if data.get('type') == 'session_meta':
+                payload = data.get('payload', {})
+                return payload.get('cwd', '')
     except:
         pass
     return ''
@@ -143,173 +313,318 @@ def list_kernelcat_projects(directory: Path) -> Dict[str, int]:
     return dict(projects)
 
 
-def deduplicate_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """去除重复的消息"""
-    seen = set()
+def deduplicate_messages(messages: List[Message], type_counts: Counter = None,
+                         user_indices: List[int] = None) -> List[Message]:
+    """去除重复的消息
+
+    有 uuid 的消息按 uuid 在全局范围内去重（与 view_chat_history.py 一致，同一 uuid 即使时间戳不同也视为重复）。
+    没有 uuid 时，去重标识本身包含时间戳，重复消息按时间排序后必然落在同一段相同时间戳内，
+    因此这类标识只需记住当前时间戳下见过的，进入新的时间戳时清空。
+
+    Args:
+        messages: 按时间排序的消息列表
+        type_counts: 按消息类型的计数，传入时会同步扣除被移除的重复消息
+        user_indices: 传入时，在同一遍扫描中记录去重后真实用户消息（非tool_result）的下标，
+                      供 calculate_total_time 直接使用
+    """
+    seen_uuids = set()
+    seen_fallback = set()  # 仅当前时间戳下的无 uuid 标识
+    current_timestamp = None
     unique_messages = []
 
     for msg in messages:
-        uuid = msg.get('uuid', '')
-        if uuid:
-            identifier = uuid
+        # 去重标识已在解析时算好
+        key = msg.dedup_key
+        if msg.uuid:
+            seen = seen_uuids
         else:
-            timestamp = msg.get('timestamp', '')
-            content = str(msg.get('message', {}))[:100]
-            identifier = f"{timestamp}_{content}"
+            timestamp = msg.timestamp
+            if timestamp != current_timestamp:
+                seen_fallback.clear()
+                current_timestamp = timestamp
+            seen = seen_fallback
+
+        if key in seen:
+            if type_counts is not None:
+                type_counts[msg.type] -= 1
+            continue
+        seen.add(key)
 
-        if identifier not in seen:
-            seen.add(identifier)
-            unique_messages.append(msg)
+        if user_indices is not None and msg.is_real_user:
+            user_indices.append(len(unique_messages))
+        unique_messages.append(msg)
 
     return unique_messages
 
 
-def calculate_total_time(messages: List[Dict[str, Any]]) -> tuple[timedelta, List[Dict[str, Any]]]:
+def _accumulate_active_time(messages: List[Message], start: int, end: int,
+                            idle_threshold: timedelta, idle_periods: List[IdlePeriod] = None) -> tuple:
+    """单遍累加一次响应中的实际工作时间
+
+    只用几个局部变量记录上一事件的状态，不构造中间事件列表。
+
+    Args:
+        messages: 按时间排序的消息列表
+        start: 用户提问所在下标
+        end: 下一条真实用户消息的下标（不含）
+        idle_threshold: 中断阈值，超过该间隔且不是工具执行时视为中断
+        idle_periods: 传入列表时把中断时段追加进去；默认不记录
+                      （只有长响应需要展示中断明细，由调用方对这些响应再扫描一遍）
+
+    Returns:
+        (active_duration, first_time, end_time, assistant_msg_count, tool_use_count)
+        first_time/end_time 为该响应中最早/最晚的事件时间
+    """
+    start_time = messages[start].ts_dt
+    active_duration = timedelta()
+    assistant_msg_count = 0
+    tool_use_count = 0
+    prev_time = start_time
+    prev_tool_use = False
+
+    for msg in messages[start + 1:end]:
+        # 只统计助手的响应或工具结果
+        if msg.is_real_user:
+            continue
+
+        cur_time = msg.ts_dt
+        # 字符串排序与解析后的时间顺序可能不一致，遇到逆序时改为排序后计算
+        if cur_time < prev_time:
+            return _accumulate_sorted_events(messages, start, end, idle_threshold, idle_periods)
+        time_gap = cur_time - prev_time
+
+        # 工具执行时间（tool_use → tool_result）或正常工作时间 - 全部计入
+        if (prev_tool_use and msg.has_tool_result) or time_gap <= idle_threshold:
+            active_duration += time_gap
+        elif idle_periods is not None:
+            idle_periods.append(IdlePeriod(prev_time, cur_time, time_gap))
+
+        assistant_msg_count += 1
+        prev_tool_use = msg.has_tool_use
+        if prev_tool_use:
+            tool_use_count += 1
+        prev_time = cur_time
+
+    return active_duration, start_time, prev_time, assistant_msg_count, tool_use_count
+
+
+def _accumulate_sorted_events(messages: List[Message], start: int, end: int,
+                              idle_threshold: timedelta, idle_periods: List[IdlePeriod] = None) -> tuple:
+    """按解析后的时间排序事件后累加实际工作时间（_accumulate_active_time 遇到逆序时间戳时使用）
+
+    参数和返回值与 _accumulate_active_time 相同。
+    """
+    events = [(messages[start].ts_dt, False, False)]
+    events.extend([(m.ts_dt, m.has_tool_use, m.has_tool_result)
+                   for m in messages[start + 1:end] if not m.is_real_user])
+    events.sort(key=_BY_EVENT_TIME)
+
+    if idle_periods is not None:
+        # 按排序后的事件重新记录中断时段
+        idle_periods.clear()
+
+    active_duration = timedelta()
+    prev_time, prev_tool_use, _ = events[0]
+    for cur_time, has_tool_use, has_tool_result in events[1:]:
+        time_gap = cur_time - prev_time
+        if (prev_tool_use and has_tool_result) or time_gap <= idle_threshold:
+            active_duration += time_gap
+        elif idle_periods is not None:
+            idle_periods.append(IdlePeriod(prev_time, cur_time, time_gap))
+        prev_time = cur_time
+        prev_tool_use = has_tool_use
+
+    tool_use_count = sum(1 for e in events if e[1])
+    return active_duration, events[0][0], prev_time, len(events) - 1, tool_use_count
+
+
+def calculate_total_time(messages: List[Message],
+                         user_indices: List[int] = None) -> tuple[timedelta, List[LongResponse]]:
     """计算助手总处理时间（包含完整的工具调用过程，排除长时间中断）
 
     算法：
-    1. 找到每个真实的用户消息（非tool_result）
-    2. 找到该用户消息之后的所有助手响应（assistant + tool_result）
+    1. 预先找出所有真实的用户消息（非tool_result）的位置
+    2. 相邻两条真实用户消息之间即为一次完整响应（assistant + tool_result）
     3. 计算实际工作时间，排除超过30分钟的消息间隔（视为中断）
     4. 累加所有时间差
     5. 标记超过1小时的长响应
 
+    直接使用解析阶段得到的 ts_dt（已解析的时间戳），此处不再重复解析。
+
+    Args:
+        messages: 按时间排序的消息列表
+        user_indices: 真实用户消息的下标（由 deduplicate_messages 顺带计算），为 None 时在此计算
+
     Returns:
         (total_time, long_responses) 总时间和长响应列表
     """
     total_time = timedelta()
     long_responses = []  # 超过1小时的响应
-    IDLE_THRESHOLD = timedelta(minutes=30)  # 超过30分钟视为中断
 
-    i = 0
-    while i < len(messages):
+    # 真实用户消息（非tool_result）的下标：既是一次提问的起点，也是上一次响应的终点
+    if user_indices is None:
+        user_indices = [idx for idx, m in enumerate(messages) if m.is_real_user]
+
+    for i, end in zip(user_indices, user_indices[1:] + [len(messages)]):
         msg = messages[i]
 
-        # 找到真实的用户消息（不是tool_result，且不是空消息）
-        if msg['type'] == 'user' and not msg.get('has_tool_result', False):
-            # 检查消息内容是否为空（权限确认等空消息不算真实用户提问）
-            has_content = False
-            for content in msg.get('message', {}).get('content', []):
-                if isinstance(content, dict) and content.get('type') == 'text':
-                    text = content.get('text', '').strip()
-                    if text:
-                        has_content = True
-                        break
+        # 跳过空消息（权限确认等空消息不算真实用户提问）
+        if not msg.has_text:
+            continue
 
-            # 跳过空消息
-            if not has_content:
-                i += 1
-                continue
-
-            # 这是一条真实的用户提问
-            try:
-                start_time = datetime.fromisoformat(msg['timestamp'].replace('Z', '+00:00'))
-
-                # 收集该用户消息后的所有助手相关响应（保留类型信息）
-                j = i + 1
-                response_events = [{'time': start_time, 'has_tool_use': False, 'has_tool_result': False}]
-                assistant_msg_count = 0
-                tool_use_count = 0
-
-                while j < len(messages):
-                    next_msg = messages[j]
-
-                    if next_msg['type'] == 'assistant' or next_msg.get('has_tool_result', False):
-                        # 这是助手的响应或工具结果
-                        msg_time = datetime.fromisoformat(next_msg['timestamp'].replace('Z', '+00:00'))
-                        response_events.append({
-                            'time': msg_time,
-                            'has_tool_use': next_msg.get('has_tool_use', False),
-                            'has_tool_result': next_msg.get('has_tool_result', False)
-                        })
-                        assistant_msg_count += 1
-                        if next_msg.get('has_tool_use', False):
-                            tool_use_count += 1
-                        j += 1
-                    elif next_msg['type'] == 'user' and not next_msg.get('has_tool_result', False):
-                        # 遇到下一个真实用户消息，停止
-                        break
-                    else:
-                        j += 1
-
-                # 计算实际工作时间（排除长时间中断，但保留工具执行时间）
-                response_events.sort(key=lambda x: x['time'])
-                active_duration = timedelta()
-                idle_periods = []  # 记录中断时段
-
-                for k in range(len(response_events) - 1):
-                    current_event = response_events[k]
-                    next_event = response_events[k + 1]
-                    time_gap = next_event['time'] - current_event['time']
-
-                    # 判断这个间隔是否是工具执行时间
-                    is_tool_execution = (
-                        current_event['has_tool_use'] and
-                        next_event['has_tool_result']
-                    )
-
-                    if is_tool_execution or time_gap <= IDLE_THRESHOLD:
-                        # 工具执行时间或正常工作时间 - 全部计入
-                        active_duration += time_gap
-                    else:
-                        # 中断时段
-                        idle_periods.append({
-                            'start': current_event['time'],
-                            'end': next_event['time'],
-                            'duration': time_gap
-                        })
+        # 这是一条真实的用户提问
+        try:
+            start_time = msg.ts_dt
+
+            # 计算实际工作时间（排除长时间中断，但保留工具执行时间）
+            active_duration, first_time, end_time, assistant_msg_count, tool_use_count = \
+                _accumulate_active_time(messages, i, end, IDLE_THRESHOLD)
 
+            if active_duration > _ZERO:
                 # 总时长（包含中断）
-                total_duration = response_events[-1]['time'] - response_events[0]['time'] if len(response_events) > 1 else timedelta()
-
-                if active_duration > timedelta(0):
-                    # 提取用户问题的简短摘要
-                    user_text = ""
-                    for content in msg.get('message', {}).get('content', []):
-                        if content.get('type') == 'text':
-                            user_text = content.get('text', '')[:100]
-                            break
-
-                    # 如果总时长超过1小时，记录详细信息
-                    if total_duration >= timedelta(hours=1):
-                        long_responses.append({
-                            'user_question': user_text,
-                            'start_time': start_time,
-                            'end_time': response_events[-1]['time'],
-                            'total_duration': total_duration,
-                            'active_duration': active_duration,
-                            'idle_periods': idle_periods,
-                            'assistant_messages': assistant_msg_count,
-                            'tool_uses': tool_use_count
-                        })
-
-                    # 累加实际工作时间（不含中断）
-                    total_time += active_duration
-
-            except Exception as e:
-                pass
-
-        i += 1
+                total_duration = end_time - first_time
+
+                # 如果总时长超过1小时，记录详细信息
+                if total_duration >= LONG_RESPONSE_THRESHOLD:
+                    # 长响应很少，只对它们再扫描一遍收集中断明细
+                    idle_periods = []
+                    _accumulate_active_time(messages, i, end, IDLE_THRESHOLD, idle_periods)
+
+                    long_responses.append(LongResponse(
+                        user_question=msg.first_text,  # 解析时已提取
+                        start_time=start_time,
+                        end_time=end_time,
+                        total_duration=total_duration,
+                        active_duration=active_duration,
+                        idle_periods=idle_periods,
+                        assistant_messages=assistant_msg_count,
+                        tool_uses=tool_use_count
+                    ))
+
+                # 累加实际工作时间（不含中断）
+                total_time += active_duration
+
+        except Exception as e:
+            pass
 
     return total_time, long_responses
 
 
 def format_timedelta(td: timedelta) -> str:
-    """格式化时间间隔"""
-    total_seconds = int(td.total_seconds())
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
-    seconds = total_seconds % 60
+    """格式化时间间隔（省略为0的部分，全为0时显示秒）"""
+    hours, rest = divmod(td.days * 86400 + td.seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
 
-    parts = []
     if hours > 0:
-        parts.append(f"{hours}小时")
+        if minutes > 0:
+            return f"{hours}小时 {minutes}分钟 {seconds}秒" if seconds > 0 else f"{hours}小时 {minutes}分钟"
+        return f"{hours}小时 {seconds}秒" if seconds > 0 else f"{hours}小时"
     if minutes > 0:
-        parts.append(f"{minutes}分钟")
-    if seconds > 0 or not parts:
-        parts.append(f"{seconds}秒")
+        return f"{minutes}分钟 {seconds}秒" if seconds > 0 else f"{minutes}分钟"
+    return f"{seconds}秒"
+
+
+def _iter_lines(mm: mmap.mmap):
+    """逐行切出内存映射文件的内容（bytes，不含换行符）
+
+    用 find(b'\n') 在 C 层定位行尾，不把整个文件读成一个 bytes 对象；
+    页面由内核按需换入，进程内只有当前行的副本。
+    """
+    pos = 0
+    size = len(mm)
+    find = mm.find
+    while pos < size:
+        nl = find(b'\n', pos)
+        if nl < 0:
+            nl = size
+        yield mm[pos:nl]
+        pos = nl + 1
+
+
+def _parse_file(task: Tuple[Any, str, bool, str]) -> tuple:
+    """解析单个 jsonl 文件（在子进程中执行）
 
-    return " ".join(parts)
+    Args:
+        task: (文件路径, CLI工具名称, 是否需要项目信息, 项目过滤)
+              claude-code 传入字符串路径，kcat 传入 Path（解析时需要文件名中的 session_id）
+
+    Returns:
+        (messages, sessions, date_counts, type_counts, earliest, latest, project)，
+        文件不属于过滤的项目时返回 None
+    """
+    file_path, cli_name, need_project, project_filter = task
+    # 按 CLI 类型选定解析器
+    if cli_name == 'claude-code':
+        parse_line = functools.partial(parse_claude_code_line, file_path=file_path)
+    else:
+        parse_line = functools.partial(parse_kernelcat_line, file_path=file_path,
+                                       session_id=_kernelcat_session_id(file_path))
+
+    messages = []
+    sessions = set()
+    dates = []  # 每条消息的日期（公历序数，整数），最后一次性计数
+    earliest = None
+    latest = None
+
+    # 项目信息（仅 kernelcat）从首行提取
+    project = ''
+
+    try:
+        # 内存映射整个文件（空文件映射失败由外层 except 处理）
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            loads = _json.loads
+            for line in _iter_lines(mm):
+                if need_project:
+                    # 只看首行
+                    need_project = False
+                    project = _project_from_first_line(line)
+                    if project_filter and not (project and project_filter in project):
+                        # 不属于过滤的项目，其余行无需解析
+                        break
+                if not line or line.isspace():
+                    continue
+
+                try:
+                    data = loads(line)
+
+                    # 使用对应的解析器
+                    message, session_id = parse_line(data)
+                    if message is None:
+                        continue
+
+                    # 收集消息
+                    messages.append(message)
+
+                    # 记录会话ID
+                    if session_id:
+                        sessions.add(session_id)
+
+                    # 记录日期（时间戳已在解析时转换为 ts_dt，后续计算直接复用）
+                    dt = message.ts_dt
+                    if dt is not None:
+                        try:
+                            # 按日序号分桶，输出时再格式化
+                            dates.append(dt.toordinal())
+
+                            if earliest is None or dt < earliest:
+                                earliest = dt
+                            if latest is None or dt > latest:
+                                latest = dt
+                        except:
+                            pass
+
+                except (ValueError, TypeError):
+                    # orjson/ujson 的解析错误均为 ValueError 子类
+                    continue
+    except Exception:
+        pass
+
+    if project_filter and not (project and project_filter in project):
+        return None
+
+    # 消息类型在这里一次性计数
+    type_counts = Counter(map(_BY_TYPE, messages))
+    return messages, sessions, Counter(dates), type_counts, earliest, latest, project
 
 
 def get_stats(data_dir: Path = None, cli_name: str = 'claude-code', project_filter: str = None,
@@ -339,226 +654,224 @@ def get_stats(data_dir: Path = None, cli_name: str = 'claude-code', project_filt
     all_messages = []  # 收集所有消息
     sessions = set()
     files_by_type = {'main': 0, 'agent': 0}
-    messages_by_date = defaultdict(int)
-    messages_by_project = defaultdict(list)  # 按项目收集消息（仅kcat）
+    messages_by_date = Counter()
+    type_counts = Counter()  # 按消息类型计数（解析时累加，去重时扣除）
+    project_sizes = defaultdict(int)  # 按项目的原始消息数（仅kcat，用于排序）
+    session_project = {}  # 会话ID -> 项目（仅kcat），用于从全局结果中按项目取消息
     earliest_date = None
     latest_date = None
 
     # 根据 CLI 类型选择文件搜索模式
     if cli_name == 'claude-code':
-        jsonl_files = list(data_dir.glob('*.jsonl'))
+        # 扁平目录，直接按文件名筛选
+        with os.scandir(data_dir) as it:
+            entries = [e for e in it if e.name.endswith('.jsonl') and e.is_file()]
+        jsonl_files = [e.path for e in entries]
+
+        # 统计文件类型（仅对 claude-code 有意义）
+        files_by_type['agent'] = sum(1 for e in entries if e.name.startswith('agent-'))
+        files_by_type['main'] = len(entries) - files_by_type['agent']
     elif cli_name == 'kcat':
         jsonl_files = list(data_dir.glob('**/*.jsonl'))
 
-        # 如果指定了项目过滤
+        # 如果指定了项目过滤（各文件是否属于该项目在解析时按首行判断）
         if project_filter:
-            filtered_files = []
-            for file_path in jsonl_files:
-                project = get_session_project(file_path)
-                if project and project_filter in project:
-                    filtered_files.append(file_path)
-            jsonl_files = filtered_files
-            if project_filter:
-                print(f"\n🔍 项目过滤: {project_filter}")
+            print(f"\n🔍 项目过滤: {project_filter}")
     else:
         print(f"错误: 不支持的 CLI 类型: {cli_name}")
         return
 
-    # 选择解析器
-    parser_func = parse_claude_code_line if cli_name == 'claude-code' else parse_kernelcat_line
+    # 各文件相互独立，多进程并行解析后按文件顺序合并
+    if cli_name != 'kcat':
+        project_filter = None
+    need_project = cli_name == 'kcat' and (group_by_project or bool(project_filter))
+    tasks = [(file_path, cli_name, need_project, project_filter) for file_path in jsonl_files]
+    # 进程数不超过文件数；只有一个进程可用时进程池只有开销，直接串行
+    workers = min(len(tasks), os.cpu_count() or 1)
+    if workers > 1:
+        # 文件较多时按批分发，减少进程间往返次数
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_parse_file, tasks, chunksize=chunksize))
+    else:
+        results = [_parse_file(task) for task in tasks]
 
-    # 遍历所有jsonl文件
-    for file_path in jsonl_files:
-        # 统计文件类型（仅对 claude-code 有意义）
-        if cli_name == 'claude-code':
-            if file_path.name.startswith('agent-'):
-                files_by_type['agent'] += 1
-            else:
-                files_by_type['main'] += 1
-        else:
-            files_by_type['main'] += 1
+    # 去掉不属于过滤项目的文件
+    results = [result for result in results if result is not None]
+    if cli_name == 'kcat':
+        files_by_type['main'] = len(results)
+
+    for messages, file_sessions, date_counts, file_type_counts, file_earliest, file_latest, project in results:
+        # 收集消息
+        all_messages.extend(messages)
+        type_counts.update(file_type_counts)
 
-        # 获取项目信息（仅 kernelcat）
-        project = ''
-        if cli_name == 'kcat' and group_by_project:
-            project = get_session_project(file_path)
+        # 如果需要按项目分组（仅 kernelcat）
+        if group_by_project and project:
+            project_sizes[project] += len(messages)
+            for session_id in file_sessions:
+                session_project[session_id] = project
 
+        # 记录会话ID和日期
+        sessions |= file_sessions
+        messages_by_date.update(date_counts)
+
+        # 带时区与不带时区的时间无法比较，跳过
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if not line.strip():
-                        continue
+            if file_earliest is not None and (earliest_date is None or file_earliest < earliest_date):
+                earliest_date = file_earliest
+            if file_latest is not None and (latest_date is None or file_latest > latest_date):
+                latest_date = file_latest
+        except TypeError:
+            pass
 
-                    try:
-                        data = json.loads(line)
-
-                        # 使用对应的解析器
-                        message, session_id = parser_func(data, file_path)
-                        if message is None:
-                            continue
-
-                        # 收集消息
-                        all_messages.append(message)
-
-                        # 如果需要按项目分组（仅 kernelcat）
-                        if cli_name == 'kcat' and group_by_project and project:
-                            messages_by_project[project].append(message)
-
-                        # 记录会话ID
-                        if session_id:
-                            sessions.add(session_id)
-
-                        # 记录日期
-                        timestamp_str = message.get('timestamp', '')
-                        if timestamp_str:
-                            try:
-                                dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                                date_str = dt.strftime('%Y-%m-%d')
-                                messages_by_date[date_str] += 1
-
-                                if earliest_date is None or dt < earliest_date:
-                                    earliest_date = dt
-                                if latest_date is None or dt > latest_date:
-                                    latest_date = dt
-                            except:
-                                pass
-
-                    except json.JSONDecodeError:
-                        continue
-        except Exception:
-            continue
+    # 按时间戳字符串稳定排序（与时间顺序可能不一致，见 _accumulate_active_time）
+    all_messages.sort(key=_BY_TIMESTAMP)
 
-    # 去重
+    # 去重，同一遍扫描中找出真实用户消息的位置
     original_count = len(all_messages)
-    all_messages = deduplicate_messages(all_messages)
+    user_indices = []
+    all_messages = deduplicate_messages(all_messages, type_counts, user_indices)
     deduplicated_count = len(all_messages)
 
-    # 按时间排序
-    all_messages.sort(key=lambda x: x['timestamp'])
-
     # 统计消息数
-    user_messages = sum(1 for msg in all_messages if msg['type'] == 'user')
-    assistant_messages = sum(1 for msg in all_messages if msg['type'] == 'assistant')
+    user_messages = type_counts['user']
+    assistant_messages = type_counts['assistant']
     total_messages = len(all_messages)
 
     # 计算总耗时和长响应
-    total_time, long_responses = calculate_total_time(all_messages)
-
-    # 打印统计信息
-    print("\n" + "="*80)
-    print("对话历史统计信息（已去重）")
-    print("="*80)
-
-    print(f"\n📁 文件统计:")
-    print(f"   主会话文件: {files_by_type['main']} 个")
-    print(f"   代理文件: {files_by_type['agent']} 个")
-    print(f"   总计: {files_by_type['main'] + files_by_type['agent']} 个文件")
-
-    print(f"\n💬 消息统计:")
-    print(f"   原始消息: {original_count:,} 条")
+    total_time, long_responses = calculate_total_time(all_messages, user_indices)
+
+    # 打印统计信息（先拼到列表里，最后一次性写出）
+    out = []
+    w = out.append
+    w("\n" + "="*80 + "\n")
+    w("对话历史统计信息（已去重）\n")
+    w("="*80 + "\n")
+
+    w(f"\n📁 文件统计:\n")
+    w(f"   主会话文件: {files_by_type['main']} 个\n")
+    w(f"   代理文件: {files_by_type['agent']} 个\n")
+    w(f"   总计: {files_by_type['main'] + files_by_type['agent']} 个文件\n")
+
+    w(f"\n💬 消息统计:\n")
+    w(f"   原始消息: {original_count:,} 条\n")
     if original_count != deduplicated_count:
         removed = original_count - deduplicated_count
-        print(f"   去重后: {deduplicated_count:,} 条（移除了 {removed:,} 条重复，{removed*100//original_count}%）")
-    print(f"   用户消息: {user_messages:,} 条")
-    print(f"   助手消息: {assistant_messages:,} 条")
+        w(f"   去重后: {deduplicated_count:,} 条（移除了 {removed:,} 条重复，{removed*100//original_count}%）\n")
+    w(f"   用户消息: {user_messages:,} 条\n")
+    w(f"   助手消息: {assistant_messages:,} 条\n")
 
-    print(f"\n🔗 会话统计:")
-    print(f"   不同会话: {len(sessions)} 个")
+    w(f"\n🔗 会话统计:\n")
+    w(f"   不同会话: {len(sessions)} 个\n")
 
     if earliest_date and latest_date:
-        print(f"\n📅 时间跨度:")
-        print(f"   最早消息: {earliest_date.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"   最新消息: {latest_date.strftime('%Y-%m-%d %H:%M:%S')}")
+        w(f"\n📅 时间跨度:\n")
+        w(f"   最早消息: {earliest_date.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        w(f"   最新消息: {latest_date.strftime('%Y-%m-%d %H:%M:%S')}\n")
         days_span = (latest_date - earliest_date).days
-        print(f"   跨度: {days_span} 天")
+        w(f"   跨度: {days_span} 天\n")
 
     # 耗时统计
-    print(f"\n⏱️  总耗时统计:")
-    print(f"   助手处理总时长: {format_timedelta(total_time)}")
+    w(f"\n⏱️  总耗时统计:\n")
+    w(f"   助手处理总时长: {format_timedelta(total_time)}\n")
     if assistant_messages > 0:
         avg_time = total_time / assistant_messages
-        print(f"   平均响应时间: {format_timedelta(avg_time)}")
+        w(f"   平均响应时间: {format_timedelta(avg_time)}\n")
 
     # 计算工作效率
     if earliest_date and latest_date:
         total_span = latest_date - earliest_date
         if total_span.total_seconds() > 0:
             work_percentage = (total_time.total_seconds() / total_span.total_seconds()) * 100
-            print(f"   工作时间占比: {work_percentage:.1f}% （总耗时/总跨度）")
+            w(f"   工作时间占比: {work_percentage:.1f}% （总耗时/总跨度）\n")
 
     # 显示长响应信息
     if long_responses:
-        print(f"\n⚠️  长时间响应（≥1小时）：")
-        print(f"   共 {len(long_responses)} 次超过1小时的响应")
-        print(f"\n   详细信息：")
+        w(f"\n⚠️  长时间响应（≥1小时）：\n")
+        w(f"   共 {len(long_responses)} 次超过1小时的响应\n")
+        w(f"\n   详细信息：\n")
         for i, resp in enumerate(long_responses, 1):
-            total_duration_str = format_timedelta(resp['total_duration'])
-            active_duration_str = format_timedelta(resp['active_duration'])
-            start_str = resp['start_time'].strftime('%Y-%m-%d %H:%M:%S')
-            end_str = resp['end_time'].strftime('%m-%d %H:%M:%S')
-            question = resp['user_question']
+            total_duration_str = format_timedelta(resp.total_duration)
+            active_duration_str = format_timedelta(resp.active_duration)
+            start_str = resp.start_time.strftime('%Y-%m-%d %H:%M:%S')
+            end_str = resp.end_time.strftime('%m-%d %H:%M:%S')
+            question = resp.user_question
             if len(question) > 60:
                 question = question[:57] + '...'
 
-            print(f"\n   {i}. 时间跨度: {start_str} → {end_str}")
-            print(f"      总时长: {total_duration_str}")
-            print(f"      实际工作: {active_duration_str}")
-            print(f"      用户问题: {question}")
-            print(f"      助手消息数: {resp['assistant_messages']} 条")
-            print(f"      工具调用: {resp['tool_uses']} 次")
+            w(f"\n   {i}. 时间跨度: {start_str} → {end_str}\n")
+            w(f"      总时长: {total_duration_str}\n")
+            w(f"      实际工作: {active_duration_str}\n")
+            w(f"      用户问题: {question}\n")
+            w(f"      助手消息数: {resp.assistant_messages} 条\n")
+            w(f"      工具调用: {resp.tool_uses} 次\n")
 
             # 显示中断时段
-            if resp['idle_periods']:
-                total_idle = sum((p['duration'] for p in resp['idle_periods']), timedelta())
-                print(f"      中断次数: {len(resp['idle_periods'])} 次（共 {format_timedelta(total_idle)}）")
-                for j, idle in enumerate(resp['idle_periods'], 1):
-                    idle_start = idle['start'].strftime('%m-%d %H:%M')
-                    idle_end = idle['end'].strftime('%m-%d %H:%M')
-                    idle_duration = format_timedelta(idle['duration'])
-                    print(f"         • 中断{j}: {idle_start} → {idle_end} ({idle_duration})")
-
-        print(f"\n   💡 总耗时已排除中断时间（超过30分钟无消息视为中断）")
-        print(f"      如需调整中断阈值，请修改代码中的 IDLE_THRESHOLD")
-
-    print(f"\n💡 说明:")
-    print(f"   • 总耗时 = 所有「用户提问→助手完整回复」的实际工作时间")
-    print(f"   • 包含助手的思考、工具调用、代码编写等完整过程")
-    print(f"   • 不含等待用户输入的时间")
-    print(f"   • 已排除中断时间（超过30分钟无消息视为中断）")
-    print(f"   • 已去重，避免重复计算")
+            if resp.idle_periods:
+                total_idle = sum((p.duration for p in resp.idle_periods), timedelta())
+                w(f"      中断次数: {len(resp.idle_periods)} 次（共 {format_timedelta(total_idle)}）\n")
+                for j, idle in enumerate(resp.idle_periods, 1):
+                    idle_start = idle.start.strftime('%m-%d %H:%M')
+                    idle_end = idle.end.strftime('%m-%d %H:%M')
+                    idle_duration = format_timedelta(idle.duration)
+                    w(f"         • 中断{j}: {idle_start} → {idle_end} ({idle_duration})\n")
+
+        w(f"\n   💡 总耗时已排除中断时间（超过30分钟无消息视为中断）\n")
+        w(f"      如需调整中断阈值，请修改代码中的 IDLE_THRESHOLD\n")
+
+    w(f"\n💡 说明:\n")
+    w(f"   • 总耗时 = 所有「用户提问→助手完整回复」的实际工作时间\n")
+    w(f"   • 包含助手的思考、工具调用、代码编写等完整过程\n")
+    w(f"   • 不含等待用户输入的时间\n")
+    w(f"   • 已排除中断时间（超过30分钟无消息视为中断）\n")
+    w(f"   • 已去重，避免重复计算\n")
 
     if messages_by_date:
-        print(f"\n📊 每日消息数（最近10天）:")
+        w(f"\n📊 每日消息数（最近10天）:\n")
         sorted_dates = sorted(messages_by_date.items(), reverse=True)[:10]
-        for date_str, count in sorted_dates:
+        for day, count in sorted_dates:
+            date_str = date.fromordinal(day).isoformat()
             bar = "█" * (count // 10) + "▌" * ((count % 10) // 5)
-            print(f"   {date_str}: {count:4d} 条 {bar}")
+            w(f"   {date_str}: {count:4d} 条 {bar}\n")
 
     # 按项目分组统计（仅 kernelcat）
-    if cli_name == 'kcat' and group_by_project and messages_by_project:
-        print(f"\n📁 按项目分组统计:")
-        print("="*80)
+    if cli_name == 'kcat' and group_by_project and project_sizes:
+        w(f"\n📁 按项目分组统计:\n")
+        w("="*80 + "\n")
+
+        # 全局列表已排序、去重，按会话所属项目分拣即可
+        messages_by_project = defaultdict(list)
+        user_indices_by_project = defaultdict(list)
+        for msg in all_messages:
+            project = session_project.get(msg.session_id)
+            if project:
+                project_messages = messages_by_project[project]
+                if msg.is_real_user:
+                    user_indices_by_project[project].append(len(project_messages))
+                project_messages.append(msg)
 
         # 对每个项目计算统计
-        for project, project_messages in sorted(messages_by_project.items(),
-                                                 key=lambda x: len(x[1]), reverse=True):
-            # 去重
-            project_messages_dedup = deduplicate_messages(project_messages)
-            user_msgs = sum(1 for msg in project_messages_dedup if msg['type'] == 'user')
-            assistant_msgs = sum(1 for msg in project_messages_dedup if msg['type'] == 'assistant')
+        for project, _ in sorted(project_sizes.items(), key=lambda x: x[1], reverse=True):
+            project_messages = messages_by_project[project]
+            project_counts = Counter(map(_BY_TYPE, project_messages))
+            user_msgs = project_counts['user']
+            assistant_msgs = project_counts['assistant']
 
             # 计算耗时
-            total_time, _ = calculate_total_time(project_messages_dedup)
+            total_time, _ = calculate_total_time(project_messages, user_indices_by_project[project])
 
-            print(f"\n📁 {project}")
-            print(f"   消息数: {len(project_messages_dedup)} 条（用户: {user_msgs}, 助手: {assistant_msgs}）")
-            print(f"   总耗时: {format_timedelta(total_time)}")
+            w(f"\n📁 {project}\n")
+            w(f"   消息数: {len(project_messages)} 条（用户: {user_msgs}, 助手: {assistant_msgs}）\n")
+            w(f"   总耗时: {format_timedelta(total_time)}\n")
 
-        print("\n" + "="*80)
+        w("\n" + "="*80 + "\n")
+
+    w("\n" + "="*80 + "\n")
+    w("\n💡 查看完整对话内容:\n")
+    w("   python3 view_chat_history.py --deduplicate --no-thinking --limit 50\n\n")
 
-    print("\n" + "="*80)
-    print("\n💡 查看完整对话内容:")
-    print("   python3 view_chat_history.py --deduplicate --no-thinking --limit 50\n")
+    sys.stdout.write(''.join(out))
 
 
 if __name__ == '__main__':
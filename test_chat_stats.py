@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+chat_stats.py 的单元测试
+
+运行: python -m unittest test_chat_stats
+"""
+
+import unittest
+from datetime import timedelta
+from pathlib import Path
+
+from chat_stats import parse_claude_code_line, calculate_total_time
+
+
+def _line(msg_type: str, timestamp: str, uuid: str, content) -> dict:
+    return {
+        'type': msg_type,
+        'timestamp': timestamp,
+        'uuid': uuid,
+        'sessionId': 'sess',
+        'message': {'role': msg_type, 'content': content}
+    }
+
+
+class StringContentPromptTest(unittest.TestCase):
+    """用户直接输入的提示词 content 为纯字符串，应视为真实用户提问"""
+
+    def test_string_prompt_has_text(self):
+        msg, _ = parse_claude_code_line(_line('user', '2025-01-01T00:00:00Z', 'u1', 'typed prompt'),
+                                        Path('s.jsonl'))
+        self.assertTrue(msg.is_real_user)
+        self.assertTrue(msg.has_text)
+        self.assertEqual(msg.first_text, 'typed prompt')
+
+    def test_blank_string_prompt_has_no_text(self):
+        msg, _ = parse_claude_code_line(_line('user', '2025-01-01T00:00:00Z', 'u1', '   '),
+                                        Path('s.jsonl'))
+        self.assertFalse(msg.has_text)
+
+    def test_string_prompt_response_time_counted(self):
+        lines = [
+            _line('user', '2025-01-01T00:00:00Z', 'u1', 'typed prompt'),
+            _line('assistant', '2025-01-01T00:20:00Z', 'a1', [{'type': 'text', 'text': 'ok'}]),
+        ]
+        messages = [parse_claude_code_line(data, Path('s.jsonl'))[0] for data in lines]
+        total_time, long_responses = calculate_total_time(messages)
+        self.assertEqual(total_time, timedelta(minutes=20))
+        self.assertEqual(long_responses, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,6 +19,7 @@
     --no-color: 禁用颜色输出（默认自动检测）
     --export FILE: 导出到文本文件
     --include-agents: 包含代理文件（仅用于claude-code）
+    --jobs N: 并行解析文件的进程数（默认为CPU核数）
 
 示例:
     # Claude Code
@@ -42,11 +43,36 @@
 import json
 import os
 import sys
+import operator
+import functools
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, NamedTuple
 import argparse
 
+# 优先使用更快的 JSON 解析库（orjson > ujson > 标准库 json），三者都可以直接解析 bytes
+try:
+    import orjson as _json
+except ImportError:
+    try:
+        import ujson as _json
+    except ImportError:
+        _json = json
+
+
+class Msg(NamedTuple):
+    """显示和导出用的一条对话消息（由 parse_claude_code_message / parse_kernelcat_message 生成）"""
+    type: str
+    timestamp: str
+    session_id: str
+    message: Any  # 消息内容字典；以 lazy_content 方式加载时为 None，内容在 message_json 中
+    uuid: str
+    file: str
+    dedup_key: Any  # 去重标识：有 uuid 时为 uuid，否则为 _fallback_dedup_key 生成的元组
+    message_json: Any = None  # JSON 编码后的消息内容（bytes 或 str，取决于所用的 JSON 库）
+
 
 # ANSI颜色代码
 class Colors:
@@ -74,8 +100,15 @@ class Colors:
     HIGHLIGHT = '\033[1;32m'  # 粗体绿色 - 重要信息
 
 
+# 分隔线（模块加载时生成一次）
+SEPARATOR_LINE = '─' * 80
+DOUBLE_LINE = '=' * 80
+THINKING_FOOTER = f"╚{'═' * 120}╝"
+
+
+@functools.lru_cache(maxsize=1)
 def supports_color() -> bool:
-    """检测终端是否支持颜色"""
+    """检测终端是否支持颜色（结果在进程内不变，只检测一次）"""
     # 如果输出被重定向（管道），不使用颜色
     if not sys.stdout.isatty():
         return False
@@ -101,19 +134,34 @@ def colorize(text: str, color: str, use_color: bool = True) -> str:
     return f"{color}{text}{Colors.RESET}"
 
 
-def parse_claude_code_message(data: Dict, file_name: str) -> Dict[str, Any]:
+def _fallback_dedup_key(timestamp: str, msg_type: str, session_id: str, message: Any) -> tuple:
+    """为没有 uuid 的消息生成去重标识
+
+    以时间戳、类型、会话和首段文本的前40个字符组成元组（与 chat_stats.py 一致），
+    不对整个消息字典做 str()（开销与内容大小成正比，且结果依赖字典的 repr）。
+    """
+    content = message.get('content') if message else None
+    if isinstance(content, str):
+        text = content
+    elif content and isinstance(content[0], dict):
+        text = content[0].get('text') or ''
+    else:
+        text = ''
+    return (timestamp, msg_type, session_id, text[:40])
+
+
+def parse_claude_code_message(data: Dict, file_name: str) -> Msg:
     """解析 Claude Code 格式的消息"""
-    return {
-        'type': data['type'],
-        'timestamp': data.get('timestamp', ''),
-        'session_id': data.get('sessionId', ''),
-        'message': data.get('message', {}),
-        'uuid': data.get('uuid', ''),
-        'file': file_name
-    }
+    msg_type = data['type']
+    timestamp = data.get('timestamp', '')
+    session_id = data.get('sessionId', '')
+    message = data.get('message', {})
+    uuid = data.get('uuid', '')
+    return Msg(msg_type, timestamp, session_id, message, uuid, file_name,
+               uuid or _fallback_dedup_key(timestamp, msg_type, session_id, message))
 
 
-def parse_kernelcat_message(data: Dict, file_name: str, session_id: str) -> Dict[str, Any]:
+def parse_kernelcat_message(data: Dict, file_name: str, session_id: str) -> Msg:
     """解析 kernelcat 格式的消息"""
     payload = data.get('payload', {})
     role = payload.get('role', '')
@@ -132,85 +180,114 @@ def parse_kernelcat_message(data: Dict, file_name: str, session_id: str) -> Dict
             # 保留其他类型
             message_content.append(item)
 
-    return {
-        'type': role,  # 'user' 或 'assistant'
-        'timestamp': data.get('timestamp', ''),
-        'session_id': session_id,
-        'message': {'content': message_content},
-        'uuid': '',  # kernelcat 没有 uuid，使用timestamp去重
-        'file': file_name
-    }
+    # kernelcat 没有 uuid，使用时间戳等字段去重
+    timestamp = data.get('timestamp', '')
+    message = {'content': message_content}
+    return Msg(role, timestamp, session_id, message, '', file_name,  # role 为 'user' 或 'assistant'
+               _fallback_dedup_key(timestamp, role, session_id, message))
 
 
-def load_messages_from_file(file_path: Path, cli_name: str = 'claude-code') -> List[Dict[str, Any]]:
+def get_message_data(msg: Msg) -> Dict:
+    """取消息的 message 字段
+
+    以 lazy_content 方式加载的消息只保存了 JSON 编码后的内容，访问时才解码
+    （只有显示或导出的消息才会走到这里，每条消息解码一次）。
+    """
+    if msg.message_json is not None:
+        return _json.loads(msg.message_json)
+    return msg.message
+
+
+def load_messages_from_file(file_path: Path, cli_name: str = 'claude-code',
+                            lazy_content: bool = False, session_filter: str = None) -> List[Msg]:
     """从单个JSONL文件中加载所有消息
 
     Args:
         file_path: JSONL文件路径
         cli_name: CLI工具名称 ('claude-code' 或 'kcat')
+        lazy_content: 是否把 message 字段编码为 JSON 保存在 message_json 中（子进程解析时使用）
+        session_filter: 会话ID过滤，只保留 session_id 包含该字符串的消息
     """
     messages = []
 
     # 从文件名提取 session_id (用于 kernelcat)
     session_id = file_path.stem.split('-')[-1] if cli_name == 'kcat' else ''
 
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if not line.strip():
-                    continue
+    # kernelcat 的整个文件属于同一会话，不匹配时无需读取
+    if session_filter and cli_name == 'kcat' and session_filter not in session_id:
+        return messages
 
-                try:
-                    data = json.loads(line)
-
-                    if cli_name == 'claude-code':
-                        # Claude Code 格式: type 在顶层
-                        if data.get('type') in ['user', 'assistant']:
-                            msg = parse_claude_code_message(data, file_path.name)
+    try:
+        # 一次读入整个文件，按行切出的 bytes 直接交给 JSON 解析器
+        with open(file_path, 'rb') as f:
+            blob = f.read()
+
+        for line in blob.split(b'\n'):
+            if not line or line.isspace():
+                continue
+
+            try:
+                data = _json.loads(line)
+
+                if cli_name == 'claude-code':
+                    # Claude Code 格式: type 在顶层
+                    if data.get('type') in ['user', 'assistant']:
+                        msg = parse_claude_code_message(data, file_path.name)
+                        messages.append(msg)
+
+                elif cli_name == 'kcat':
+                    # kernelcat 格式: type=response_item，role在payload中
+                    if data.get('type') == 'response_item':
+                        payload = data.get('payload', {})
+                        if payload.get('role') in ['user', 'assistant']:
+                            msg = parse_kernelcat_message(data, file_path.name, session_id)
                             messages.append(msg)
 
-                    elif cli_name == 'kcat':
-                        # kernelcat 格式: type=response_item，role在payload中
-                        if data.get('type') == 'response_item':
-                            payload = data.get('payload', {})
-                            if payload.get('role') in ['user', 'assistant']:
-                                msg = parse_kernelcat_message(data, file_path.name, session_id)
-                                messages.append(msg)
-
-                except json.JSONDecodeError:
-                    continue
+            except ValueError:
+                # orjson/ujson/json 的解析错误均为 ValueError 子类
+                continue
     except Exception as e:
         print(f"警告: 读取文件 {file_path.name} 时出错: {e}")
 
+    if session_filter and cli_name == 'claude-code':
+        messages = [msg for msg in messages if session_filter in msg.session_id]
+
+    if lazy_content:
+        dumps = _json.dumps
+        for i, msg in enumerate(messages):
+            try:
+                messages[i] = msg._replace(message=None, message_json=dumps(msg.message))
+            except (TypeError, ValueError, RecursionError):
+                # orjson 编码的嵌套深度上限低于解码，编码失败时保留原字典
+                pass
+
     return messages
 
 
-def deduplicate_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def deduplicate_messages(messages: List[Msg], seen: set = None) -> List[Msg]:
     """去除重复的消息
 
     重复判断依据：
     1. 首先使用UUID（如果有的话）
-    2. 如果没有UUID，使用时间戳+消息内容的前100个字符
+    2. 如果没有UUID，使用时间戳、类型、会话和首段文本的前40个字符（与 chat_stats.py 一致）
+
+    Args:
+        messages: 消息列表
+        seen: 已见过的消息标识；传入同一个集合分批调用时，可跨批次去重
     """
-    seen = set()
+    if seen is None:
+        seen = set()
     unique_messages = []
+    seen_add = seen.add
+    append = unique_messages.append
 
     for msg in messages:
-        # 生成消息的唯一标识
-        uuid = msg.get('uuid', '')
-
-        if uuid:
-            # 使用UUID作为唯一标识
-            identifier = uuid
-        else:
-            # 使用时间戳+内容前100字符作为标识
-            timestamp = msg.get('timestamp', '')
-            content = str(msg.get('message', {}))[:100]
-            identifier = f"{timestamp}_{content}"
+        # 唯一标识在解析时已生成；同一 uuid 重复出现是 agent 文件等处的副本
+        identifier = msg.dedup_key
 
         if identifier not in seen:
-            seen.add(identifier)
-            unique_messages.append(msg)
+            seen_add(identifier)
+            append(msg)
 
     return unique_messages
 
@@ -259,8 +336,13 @@ def list_kernelcat_projects(directory: Path) -> Dict[str, List[Path]]:
     return dict(projects)
 
 
+# 排序键：C 实现的取值函数，避免每次调用 Python lambda
+_BY_TIMESTAMP = operator.attrgetter('timestamp')
+
+
 def load_all_messages(directory: Path, include_agents: bool = False, cli_name: str = 'claude-code',
-                     project_filter: str = None) -> List[Dict[str, Any]]:
+                     project_filter: str = None, jobs: int = None,
+                     deduplicate: bool = False, session_filter: str = None) -> Tuple[List[Msg], int]:
     """加载目录中所有JSONL文件的消息
 
     Args:
@@ -268,16 +350,22 @@ def load_all_messages(directory: Path, include_agents: bool = False, cli_name: s
         include_agents: 是否包含agent文件（仅用于claude-code）
         cli_name: CLI工具名称 ('claude-code' 或 'kcat')
         project_filter: 项目路径过滤（仅用于kcat）
+        jobs: 并行解析的进程数（默认为CPU核数）
+        deduplicate: 是否在合并各文件结果时去重
+        session_filter: 会话ID过滤，在各文件解析时即丢弃不匹配的消息，去重和排序只处理选中的会话
+
+    Returns:
+        (messages, loaded_count) 按时间排序的消息列表，以及去重前加载的消息数
     """
     all_messages = []
 
     if cli_name == 'claude-code':
         # Claude Code: 扁平目录结构，所有文件在同一目录
-        jsonl_files = list(directory.glob('*.jsonl'))
-
-        # 过滤 agent 文件
-        if not include_agents:
-            jsonl_files = [f for f in jsonl_files if not f.name.startswith('agent-')]
+        # 直接按文件名筛选（同时过滤 agent 文件）
+        with os.scandir(directory) as it:
+            jsonl_files = [Path(e.path) for e in it
+                           if e.name.endswith('.jsonl') and e.is_file()
+                           and (include_agents or not e.name.startswith('agent-'))]
 
     elif cli_name == 'kcat':
         # kernelcat: YYYY/MM/DD 目录结构
@@ -295,136 +383,190 @@ def load_all_messages(directory: Path, include_agents: bool = False, cli_name: s
 
     print(f"找到 {len(jsonl_files)} 个对话记录文件")
 
-    for file_path in jsonl_files:
-        messages = load_messages_from_file(file_path, cli_name)
+    # 多进程并行解析后按文件顺序合并；文件很少或只有一个进程时直接串行
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    workers = min(len(jsonl_files), jobs)
+    if len(jsonl_files) > 2 and workers > 1:
+        chunksize = max(1, len(jsonl_files) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(load_messages_from_file, jsonl_files, repeat(cli_name),
+                                        repeat(True), repeat(session_filter), chunksize=chunksize))
+    else:
+        results = (load_messages_from_file(file_path, cli_name, session_filter=session_filter)
+                   for file_path in jsonl_files)
+
+    loaded_count = 0
+    # 合并各文件结果时即去重，排序只处理去重后的消息
+    seen = set() if deduplicate else None
+    for messages in results:
+        loaded_count += len(messages)
+        if seen is not None:
+            messages = deduplicate_messages(messages, seen)
         all_messages.extend(messages)
 
-    # 按时间戳排序
-    all_messages.sort(key=lambda x: x['timestamp'])
+    # 按时间戳排序（各文件内部通常已有序，Timsort 会直接归并）
+    all_messages.sort(key=_BY_TIMESTAMP)
+
+    return all_messages, loaded_count
 
-    return all_messages
 
+def _format_bash_input(tool_input: Dict, lines: List[str]):
+    """Bash：命令和说明"""
+    cmd = tool_input.get('command', '')
+    desc = tool_input.get('description', '')
+    lines.append(f"│  命令: {cmd}")
+    if desc:
+        lines.append(f"│  说明: {desc}")
 
-def format_tool_use(tool_item: Dict, use_color: bool = True) -> str:
-    """格式化工具调用"""
+
+def _format_read_input(tool_input: Dict, lines: List[str]):
+    """Read：文件路径"""
+    file_path = tool_input.get('file_path', '')
+    lines.append(f"│  文件: {file_path}")
+
+
+def _format_write_input(tool_input: Dict, lines: List[str]):
+    """Write：文件路径和内容长度"""
+    _format_read_input(tool_input, lines)
+    content = tool_input.get('content', '')
+    lines.append(f"│  内容长度: {len(content)} 字符")
+
+
+def _format_edit_input(tool_input: Dict, lines: List[str]):
+    """Edit：文件路径和修改前后的长度"""
+    _format_read_input(tool_input, lines)
+    old_str = tool_input.get('old_string', '')
+    new_str = tool_input.get('new_string', '')
+    if old_str:
+        lines.append(f"│  修改: {len(old_str)} → {len(new_str)} 字符")
+
+
+def _format_glob_input(tool_input: Dict, lines: List[str]):
+    """Glob：匹配模式"""
+    pattern = tool_input.get('pattern', '')
+    lines.append(f"│  模式: {pattern}")
+
+
+def _format_grep_input(tool_input: Dict, lines: List[str]):
+    """Grep：搜索内容和输出模式"""
+    pattern = tool_input.get('pattern', '')
+    output_mode = tool_input.get('output_mode', 'files_with_matches')
+    lines.append(f"│  搜索: {pattern}")
+    lines.append(f"│  模式: {output_mode}")
+
+
+def _format_task_input(tool_input: Dict, lines: List[str]):
+    """Task：任务描述和代理类型"""
+    description = tool_input.get('description', '')
+    subagent_type = tool_input.get('subagent_type', '')
+    lines.append(f"│  任务: {description}")
+    lines.append(f"│  代理: {subagent_type}")
+
+
+def _format_generic_input(tool_input: Dict, lines: List[str]):
+    """其他工具：显示所有参数（长字符串截断到100个字符）"""
+    for key, value in tool_input.items():
+        if isinstance(value, str) and len(value) > 100:
+            value = value[:100] + '...'
+        lines.append(f"│  {key}: {value}")
+
+
+# 各工具参数的格式化函数：按工具名一次查表，未列出的工具显示所有参数
+_TOOL_INPUT_FORMATTERS = {
+    'Bash': _format_bash_input,
+    'Read': _format_read_input,
+    'Write': _format_write_input,
+    'Edit': _format_edit_input,
+    'Glob': _format_glob_input,
+    'Grep': _format_grep_input,
+    'Task': _format_task_input,
+}
+
+
+def format_tool_use(tool_item: Dict, use_color: bool = True, out: List[str] = None) -> str:
+    """格式化工具调用
+
+    Args:
+        out: 输出行缓冲；传入时各行直接追加到其中（不返回字符串），省去中间的 join
+    """
     tool_name = tool_item.get('name', 'unknown')
     tool_id = tool_item.get('id', '')[:12]
     tool_input = tool_item.get('input', {})
 
     header = f"🔧 工具调用: {tool_name} [{tool_id}]"
-    lines = [f"\n┌─ {colorize(header, Colors.TOOL_CALL, use_color)}"]
+    lines = out if out is not None else []
+    lines.append(f"\n┌─ {colorize(header, Colors.TOOL_CALL, use_color)}")
 
     # 显示主要参数
-    if tool_name == 'Bash':
-        cmd = tool_input.get('command', '')
-        desc = tool_input.get('description', '')
-        lines.append(f"│  命令: {cmd}")
-        if desc:
-            lines.append(f"│  说明: {desc}")
-
-    elif tool_name in ['Read', 'Write', 'Edit']:
-        file_path = tool_input.get('file_path', '')
-        lines.append(f"│  文件: {file_path}")
-
-        if tool_name == 'Edit':
-            old_str = tool_input.get('old_string', '')
-            new_str = tool_input.get('new_string', '')
-            if old_str:
-                preview = old_str[:100] + ('...' if len(old_str) > 100 else '')
-                lines.append(f"│  修改: {len(old_str)} → {len(new_str)} 字符")
-        elif tool_name == 'Write':
-            content = tool_input.get('content', '')
-            lines.append(f"│  内容长度: {len(content)} 字符")
-
-    elif tool_name == 'Glob':
-        pattern = tool_input.get('pattern', '')
-        lines.append(f"│  模式: {pattern}")
-
-    elif tool_name == 'Grep':
-        pattern = tool_input.get('pattern', '')
-        output_mode = tool_input.get('output_mode', 'files_with_matches')
-        lines.append(f"│  搜索: {pattern}")
-        lines.append(f"│  模式: {output_mode}")
-
-    elif tool_name == 'Task':
-        description = tool_input.get('description', '')
-        subagent_type = tool_input.get('subagent_type', '')
-        lines.append(f"│  任务: {description}")
-        lines.append(f"│  代理: {subagent_type}")
-
-    else:
-        # 其他工具，显示所有参数
-        for key, value in tool_input.items():
-            if isinstance(value, str) and len(value) > 100:
-                value = value[:100] + '...'
-            lines.append(f"│  {key}: {value}")
+    _TOOL_INPUT_FORMATTERS.get(tool_name, _format_generic_input)(tool_input, lines)
 
     lines.append("└─")
-    return '\n'.join(lines)
+    if out is None:
+        return '\n'.join(lines)
 
 
-def format_tool_result(result_item: Dict, truncate: bool = False, use_color: bool = True) -> str:
+def format_tool_result(result_item: Dict, truncate: bool = False, use_color: bool = True,
+                       out: List[str] = None) -> str:
     """格式化工具结果
 
     Args:
         result_item: 工具结果数据
         truncate: 是否截断长输出（默认False，显示完整内容）
         use_color: 是否使用颜色
+        out: 输出行缓冲；传入时各行直接追加到其中（不返回字符串），省去中间的 join
     """
     tool_id = result_item.get('tool_use_id', '')[:12]
     content = result_item.get('content', '')
 
     header = f"✅ 工具输出 [{tool_id}]"
-    lines = [f"\n┌─ {colorize(header, Colors.TOOL_OUTPUT, use_color)}"]
+    lines = out if out is not None else []
+    lines.append(f"\n┌─ {colorize(header, Colors.TOOL_OUTPUT, use_color)}")
 
     # 处理不同类型的内容
     if isinstance(content, str):
-        content_lines = content.split('\n')
-
         if truncate:
             # 截断模式：限制行数和每行长度
+            content_lines = content.split('\n')
             max_lines = 30
             max_line_length = 120
 
             if len(content_lines) > max_lines:
-                show_lines = content_lines[:max_lines]
                 lines.append(f"│  (显示前 {max_lines} 行，共 {len(content_lines)} 行)")
-                for line in show_lines:
-                    if len(line) > max_line_length:
-                        line = line[:max_line_length] + '...'
-                    lines.append(f"│  {line}")
+            lines.extend([f"│  {line[:max_line_length]}..." if len(line) > max_line_length else f"│  {line}"
+                          for line in content_lines[:max_lines]])
+            if len(content_lines) > max_lines:
                 lines.append(f"│  ... (还有 {len(content_lines) - max_lines} 行)")
-            else:
-                for line in content_lines:
-                    if len(line) > max_line_length:
-                        line = line[:max_line_length] + '...'
-                    lines.append(f"│  {line}")
         else:
             # 完整模式：显示所有内容
-            for line in content_lines:
-                lines.append(f"│  {line}")
+            lines.append("│  " + content.replace('\n', '\n│  '))
     else:
         lines.append(f"│  {content}")
 
     lines.append("└─")
-    return '\n'.join(lines)
+    if out is None:
+        return '\n'.join(lines)
 
 
 def format_message_content(content_list: List[Dict],
                           show_thinking: bool = True,
                           show_tools: bool = True,
                           truncate: bool = False,
-                          use_color: bool = True) -> str:
+                          use_color: bool = True,
+                          out: List[str] = None) -> str:
     """格式化消息内容
 
+    各部分共用同一个行缓冲，工具调用/输出的各行也直接追加进来，整条消息只在最后 join 一次。
+
     Args:
         content_list: 消息内容列表
         show_thinking: 是否显示思考过程
         show_tools: 是否显示工具调用和输出
         truncate: 是否截断长输出（默认False，显示完整内容）
         use_color: 是否使用颜色
+        out: 输出行缓冲；传入时各行直接追加到其中（不返回字符串），由调用方最后一次性拼接
     """
-    formatted_parts = []
+    formatted_parts = out if out is not None else []
 
     for content_item in content_list:
         content_type = content_item.get('type', '')
@@ -437,46 +579,44 @@ def format_message_content(content_list: List[Dict],
         elif content_type == 'thinking' and show_thinking:
             thinking = content_item.get('thinking', '')
             if thinking:
-                # 思考过程使用暗淡颜色
-                header = colorize("╔══ 💭 思考过程 ══╗", Colors.THINKING, use_color)
-                formatted_parts.append(f"\n{header}")
-                thinking_lines = thinking.split('\n')
+                # 思考过程使用暗淡颜色（整个块只用一对颜色码）
+                color_on = Colors.THINKING if use_color else ''
+                color_off = Colors.RESET if use_color else ''
+                formatted_parts.append(f"\n{color_on}╔══ 💭 思考过程 ══╗")
 
                 if truncate:
                     # 截断模式：限制行数和每行长度
+                    thinking_lines = thinking.split('\n')
                     max_thinking_lines = 20
                     max_line_length = 118
 
+                    formatted_parts.extend([f"║ {line[:max_line_length]}"
+                                            for line in thinking_lines[:max_thinking_lines]])
                     if len(thinking_lines) > max_thinking_lines:
-                        for line in thinking_lines[:max_thinking_lines]:
-                            colored_line = colorize(f"║ {line[:max_line_length]}", Colors.THINKING, use_color)
-                            formatted_parts.append(colored_line)
-                        info_line = colorize(f"║ ... (还有 {len(thinking_lines) - max_thinking_lines} 行)", Colors.THINKING, use_color)
-                        formatted_parts.append(info_line)
-                    else:
-                        for line in thinking_lines:
-                            colored_line = colorize(f"║ {line[:max_line_length]}", Colors.THINKING, use_color)
-                            formatted_parts.append(colored_line)
+                        formatted_parts.append(f"║ ... (还有 {len(thinking_lines) - max_thinking_lines} 行)")
                 else:
                     # 完整模式：显示所有内容
-                    for line in thinking_lines:
-                        colored_line = colorize(f"║ {line}", Colors.THINKING, use_color)
-                        formatted_parts.append(colored_line)
+                    formatted_parts.append("║ " + thinking.replace('\n', '\n║ '))
 
-                footer = colorize(f"╚{'═' * 120}╝", Colors.THINKING, use_color)
-                formatted_parts.append(footer)
+                formatted_parts.append(f"{THINKING_FOOTER}{color_off}")
 
         elif content_type == 'tool_use' and show_tools:
-            formatted_parts.append(format_tool_use(content_item, use_color))
+            format_tool_use(content_item, use_color, formatted_parts)
 
         elif content_type == 'tool_result' and show_tools:
-            formatted_parts.append(format_tool_result(content_item, truncate, use_color))
+            format_tool_result(content_item, truncate, use_color, formatted_parts)
 
-    return '\n'.join(formatted_parts)
+    if out is None:
+        return '\n'.join(formatted_parts)
 
 
 def format_timestamp(timestamp_str: str) -> str:
     """格式化时间戳"""
+    # 常见的 YYYY-MM-DDTHH:MM:SS... 格式直接切片
+    if (len(timestamp_str) >= 19 and timestamp_str[10] == 'T'
+            and timestamp_str[4] == timestamp_str[7] == '-'
+            and timestamp_str[13] == timestamp_str[16] == ':'):
+        return f"{timestamp_str[:10]} {timestamp_str[11:19]}"
     try:
         dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
         return dt.strftime('%Y-%m-%d %H:%M:%S')
@@ -484,7 +624,7 @@ def format_timestamp(timestamp_str: str) -> str:
         return timestamp_str
 
 
-def display_messages(messages: List[Dict[str, Any]],
+def display_messages(messages: List[Msg],
                      show_thinking: bool = True,
                      show_tools: bool = True,
                      truncate: bool = False,
@@ -502,84 +642,98 @@ def display_messages(messages: List[Dict[str, Any]],
     if limit:
         messages = messages[-limit:]
 
-    print(f"\n{'='*80}")
+    print(f"\n{DOUBLE_LINE}")
     print(colorize(f"对话历史记录 (共 {len(messages)} 条消息)", Colors.HIGHLIGHT, use_color))
-    print(f"{'='*80}\n")
+    print(f"{DOUBLE_LINE}\n")
 
-    for i, msg in enumerate(messages, 1):
-        msg_type = msg['type']
+    # 与具体消息无关的着色文本在循环外生成一次
+    separator = colorize(SEPARATOR_LINE, Colors.SEPARATOR, use_color)
+    user_role = colorize("👤 用户", Colors.USER, use_color)
+    assistant_role = colorize("🤖 助手", Colors.ASSISTANT, use_color)
 
+    for i, msg in enumerate(messages, 1):
         # 用户消息用红色，助手消息用蓝色
-        if msg_type == 'user':
-            role = colorize("👤 用户", Colors.USER, use_color)
-        else:
-            role = colorize("🤖 助手", Colors.ASSISTANT, use_color)
+        role = user_role if msg.type == 'user' else assistant_role
 
-        timestamp = format_timestamp(msg['timestamp'])
+        timestamp = format_timestamp(msg.timestamp)
         timestamp_colored = colorize(timestamp, Colors.TIMESTAMP, use_color)
 
+        # 整条消息一次输出
         # 分隔线
-        separator = colorize('─'*80, Colors.SEPARATOR, use_color)
-        print(f"\n{separator}")
+        out = [f"\n{separator}"]
 
         # 标题行
-        print(f"[{i}] {role} - {timestamp_colored}")
+        out.append(f"[{i}] {role} - {timestamp_colored}")
 
         # 元信息（灰色）
-        meta_info = f"会话: {msg['session_id'][:8]}... | 文件: {msg['file']}"
-        print(colorize(meta_info, Colors.INFO, use_color))
+        meta_info = f"会话: {msg.session_id[:8]}... | 文件: {msg.file}"
+        out.append(colorize(meta_info, Colors.INFO, use_color))
 
-        print(separator)
+        out.append(separator)
 
         # 提取并格式化消息内容
-        message_data = msg.get('message', {})
+        message_data = get_message_data(msg)
         content = message_data.get('content', [])
 
         if isinstance(content, list):
-            formatted_content = format_message_content(content, show_thinking, show_tools, truncate, use_color)
-            if formatted_content:
-                print(formatted_content)
-            else:
-                print(colorize("[空消息]", Colors.INFO, use_color))
+            header_len = len(out)
+            format_message_content(content, show_thinking, show_tools, truncate, use_color, out)
+            if len(out) == header_len:
+                out.append(colorize("[空消息]", Colors.INFO, use_color))
         else:
-            print(str(content))
+            out.append(str(content))
+
+        out.append('')
+        sys.stdout.write('\n'.join(out) + '\n')
 
-        print()
 
+# 导出时每批写入的消息数
+EXPORT_BATCH_SIZE = 256
 
-def export_to_file(messages: List[Dict[str, Any]],
+
+def export_to_file(messages: List[Msg],
                    output_file: str,
                    show_thinking: bool = True,
                    show_tools: bool = True,
                    truncate: bool = False):
     """导出消息到文本文件（不包含颜色代码）"""
 
+    # 输出先收集到列表中，每 EXPORT_BATCH_SIZE 条消息拼接后写入一次，而不是每个字段调用一次 f.write
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(f"Claude Code 对话历史记录\n")
-        f.write(f"导出时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"总消息数: {len(messages)}\n")
-        f.write(f"{'='*80}\n\n")
+        out = [
+            f"Claude Code 对话历史记录\n",
+            f"导出时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+            f"总消息数: {len(messages)}\n",
+            f"{DOUBLE_LINE}\n\n",
+        ]
 
         for i, msg in enumerate(messages, 1):
-            role = "用户" if msg['type'] == 'user' else "助手"
-            timestamp = format_timestamp(msg['timestamp'])
+            role = "用户" if msg.type == 'user' else "助手"
+            timestamp = format_timestamp(msg.timestamp)
 
-            f.write(f"\n{'─'*80}\n")
-            f.write(f"[{i}] {role} - {timestamp}\n")
-            f.write(f"会话: {msg['session_id']} | 文件: {msg['file']}\n")
-            f.write(f"{'─'*80}\n\n")
+            out.append(f"\n{SEPARATOR_LINE}\n")
+            out.append(f"[{i}] {role} - {timestamp}\n")
+            out.append(f"会话: {msg.session_id} | 文件: {msg.file}\n")
+            out.append(f"{SEPARATOR_LINE}\n\n")
 
             # 提取并格式化消息内容（不使用颜色）
-            message_data = msg.get('message', {})
+            message_data = get_message_data(msg)
             content = message_data.get('content', [])
 
             if isinstance(content, list):
-                formatted_content = format_message_content(content, show_thinking, show_tools, truncate, use_color=False)
-                f.write(formatted_content if formatted_content else "[空消息]")
+                content_lines = []
+                format_message_content(content, show_thinking, show_tools, truncate, False, content_lines)
+                out.append('\n'.join(content_lines) if content_lines else "[空消息]")
             else:
-                f.write(str(content))
+                out.append(str(content))
+
+            out.append("\n\n")
 
-            f.write("\n\n")
+            if i % EXPORT_BATCH_SIZE == 0:
+                f.write(''.join(out))
+                out.clear()
+
+        f.write(''.join(out))
 
     print(f"\n对话历史已导出到: {output_file}")
 
@@ -624,6 +778,8 @@ def main():
                         help='导出到指定文件而不是显示在终端')
     parser.add_argument('--include-agents', action='store_true',
                         help='包含代理（agent-*）文件（仅用于claude-code）')
+    parser.add_argument('--jobs', type=int, metavar='N',
+                        help='并行解析文件的进程数（默认为CPU核数）')
 
     # kernelcat 专属参数
     parser.add_argument('--list-projects', action='store_true',
@@ -633,6 +789,9 @@ def main():
 
     args = parser.parse_args()
 
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs 必须是大于等于 1 的整数')
+
     # 获取数据目录
     data_dir = Path(args.path).expanduser().resolve()
 
@@ -656,11 +815,11 @@ def main():
             return
 
         print(f"\n找到 {len(projects)} 个项目:\n")
-        print("="*80)
+        print(DOUBLE_LINE)
         for project, files in sorted(projects.items(), key=lambda x: len(x[1]), reverse=True):
             print(f"\n📁 {project}")
             print(f"   会话数: {len(files)}")
-        print("\n" + "="*80)
+        print("\n" + DOUBLE_LINE)
         print(f"\n💡 使用 --project 参数过滤特定项目:")
         print(f"   python view_chat_history.py {data_dir} --cli-name kcat --project <项目路径或关键字>\n")
         return
@@ -668,17 +827,18 @@ def main():
     # 加载所有消息
     cli_display_name = 'kernelcat' if args.cli_name == 'kcat' else 'Claude Code'
     print(f"正在加载对话记录... ({cli_display_name}: {data_dir})")
-    all_messages = load_all_messages(data_dir, include_agents=args.include_agents,
-                                    cli_name=args.cli_name, project_filter=args.project)
+    all_messages, original_count = load_all_messages(data_dir, include_agents=args.include_agents,
+                                                     cli_name=args.cli_name, project_filter=args.project,
+                                                     jobs=args.jobs, deduplicate=not args.no_deduplicate,
+                                                     session_filter=args.session)
 
-    if not all_messages:
+    # 指定会话时消息已在加载时过滤，没有匹配的会话时仍报告"过滤后找到 0 条消息"
+    if not all_messages and not args.session:
         print("没有找到任何对话消息")
         return
 
-    # 去重处理（默认启用）
+    # 去重处理（默认启用，已在加载时完成）
     if not args.no_deduplicate:
-        original_count = len(all_messages)
-        all_messages = deduplicate_messages(all_messages)
         removed_count = original_count - len(all_messages)
         if removed_count > 0:
             print(f"✓ 已去重: 移除了 {removed_count} 条重复消息（{original_count} → {len(all_messages)}）")
@@ -687,9 +847,8 @@ def main():
     else:
         print(f"⚠️  未去重: 保留了所有消息（可能包含重复）")
 
-    # 如果指定了会话ID，进行过滤
+    # 如果指定了会话ID（已在加载时过滤）
     if args.session:
-        all_messages = [msg for msg in all_messages if args.session in msg['session_id']]
         print(f"过滤后找到 {len(all_messages)} 条消息（会话 {args.session}）")
 
     # 显示或导出